@@ -1,16 +1,135 @@
+import hashlib
+import os
+import threading
+import time
+from pathlib import Path
+
 import cloudscraper
+from cloudscraper import CipherSuiteAdapter
+from urllib3.util.retry import Retry
+
+POOL_SIZE = 16
+REQUEST_TIMEOUT = 30
+# 503/403 are left to cloudscraper, which uses them to detect challenges.
+RETRY_STATUS_CODES = (429, 500, 502, 504)
+
+CACHE_DIR = '.zpcache'
+CACHE_EXPIRE_SECONDS = 3600
+# Set to 1 to always hit the network (e.g. in CI).
+CACHE_DISABLE_ENV = 'ZP_CACHE_DISABLE'
+
+
+def create_session():
+    scraper = cloudscraper.create_scraper()
+    # Remount cloudscraper's TLS adapter with a larger keep-alive pool and
+    # retries, so repeated requests to the same host reuse connections.
+    adapter = scraper.adapters['https://']
+    scraper.mount(
+        'https://',
+        CipherSuiteAdapter(
+            cipherSuite=adapter.cipherSuite,
+            ecdhCurve=adapter.ecdhCurve,
+            server_hostname=adapter.server_hostname,
+            source_address=adapter.source_address,
+            ssl_context=adapter.ssl_context,
+            pool_connections=POOL_SIZE,
+            pool_maxsize=POOL_SIZE,
+            max_retries=Retry(
+                total=3,
+                backoff_factor=0.5,
+                status_forcelist=RETRY_STATUS_CODES,
+                raise_on_status=False,
+            ),
+        )
+    )
+    return scraper
+
+
+class ResponseCache():
+    # On-disk cache of response bodies keyed by URL, so reruns don't re-crawl.
+    # Writes go through a temp file + rename, so it is safe across threads.
+    def __init__(self, directory=CACHE_DIR, expire_after=CACHE_EXPIRE_SECONDS):
+        self.directory = Path(directory)
+        self.expire_after = expire_after
+
+    def path(self, url):
+        return self.directory / hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    def fresh_path(self, url):
+        # Path of the entry if it exists and hasn't expired, else None.
+        path = self.path(url)
+        try:
+            expired = time.time() - path.stat().st_mtime > self.expire_after
+        except FileNotFoundError:
+            return None
+        if expired:
+            # Drop stale entries so the cache doesn't grow across runs.
+            path.unlink(missing_ok=True)
+            return None
+        return path
+
+    def __contains__(self, url):
+        return self.fresh_path(url) is not None
+
+    def get(self, url):
+        path = self.fresh_path(url)
+        if path is None:
+            return None
+        try:
+            return path.read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def set(self, url, content):
+        path = self.path(url)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f'.{os.getpid()}.{threading.get_ident()}.tmp')
+        tmp_path.write_bytes(content)
+        os.replace(tmp_path, path)
 
 
 class Browser():
-    def __init__(self):
-        self.scraper = cloudscraper.create_scraper()
+    def __init__(self, timeout=REQUEST_TIMEOUT, cache_dir=CACHE_DIR):
+        self.timeout = timeout
+        if cache_dir is None or os.environ.get(CACHE_DISABLE_ENV) == '1':
+            self.cache = None
+        else:
+            self.cache = ResponseCache(cache_dir)
+        # One session per thread: sessions are not safe to share across
+        # workers, but each one keeps its own pooled connections.
+        self._local = threading.local()
+
+    @property
+    def scraper(self):
+        scraper = getattr(self._local, 'scraper', None)
+        if scraper is None:
+            scraper = create_session()
+            self._local.scraper = scraper
+        return scraper
 
     def get(self, url):
-        return self.scraper.get(url)
+        return self.scraper.get(url, timeout=self.timeout)
 
     def post(self, url, data):
-        return self.scraper.post(url, data)
+        return self.scraper.post(url, data, timeout=self.timeout)
 
     def get_text(self, url):
-        return self.scraper.get(url).text
+        return self.get(url).text
+
+    def is_cached(self, url):
+        # Cached URLs are served without a request, so callers can skip
+        # their rate limiting for them.
+        return self.cache is not None and url in self.cache
+
+    def get_content(self, url):
+        # Raw bytes, so BeautifulSoup/lxml detect the encoding themselves
+        # (fast when cchardet is installed).
+        if self.cache is not None:
+            content = self.cache.get(url)
+            if content is not None:
+                return content
 
+        response = self.get(url)
+        if self.cache is not None and response.ok:
+            self.cache.set(url, response.content)
+        return response.content
@@ -1,14 +1,21 @@
 import re
 import time
-from functools import reduce
+from concurrent.futures import ThreadPoolExecutor
 
 from bs4 import BeautifulSoup
+from bs4.dammit import UnicodeDammit
+from lxml import etree, html
 
 PAGE_URL_SUFFIX = '-pagina-'
 HTML_EXTENSION = '.html'
+ESTATES_PER_PAGE = 20
+# Minimum seconds between two search page fetches.
+MIN_FETCH_INTERVAL = 3.0
 
+# Keyed by the lowercased unit without its trailing dot.
 FEATURE_UNIT_DICT = {
     'm²': 'square_meters_area',
+    'm2': 'square_meters_area',
     'amb': 'rooms',
     'dorm': 'bedrooms',
     'baño': 'bathrooms',
@@ -16,6 +23,50 @@ FEATURE_UNIT_DICT = {
     'coch' : 'parking',
     }
 
+# Qualifier that follows an area, e.g. "771 m² tot.".
+AREA_QUALIFIER_DICT = {
+    'tot': 'square_meters_total',
+    'totales': 'square_meters_total',
+    'cub': 'square_meters_covered',
+    'cubiertos': 'square_meters_covered',
+    'terr': 'square_meters_land',
+    'terreno': 'square_meters_land',
+}
+
+# Repeated features get an index suffix: rooms_0, rooms_1, ...
+INDEXED_FEATURES = (
+    'square_meters_area',
+    'square_meters_total',
+    'square_meters_covered',
+    'square_meters_land',
+    'rooms',
+    'bedrooms',
+    'bathrooms',
+    'parking',
+)
+
+NUMBER_PATTERN = re.compile(r'\d+\.?\d+')
+CURRENCY_PATTERN = re.compile(r'(USD)|(ARS)|(\$)')
+
+# Examples seen in the wild:
+# "771 m² tot. | 8 amb. | 4 dorm. | 3 baños | 1 coch."
+# We parse number + unit + optional qualifier for m².
+FEATURE_PATTERN = re.compile(
+    r'(?P<number>\d+(?:[\.,]\d+)*)\s*'
+    r'(?P<unit>m²|m2|amb\.?|dorm\.?|baños?|baño|coch\.?)'
+    r'(?:\s*(?P<qualifier>tot\.?|totales|cub\.?|cubiertos|terr\.?|terreno))?',
+    flags=re.IGNORECASE,
+)
+
+ESTATE_POSTS_XPATH = etree.XPath('//div[@data-posting-type]')
+# Zonaprop moved many fields from <div> to <h2>/<h3>.
+# Don't restrict to any tag type, just look for data-qa.
+DATA_QA_XPATH = etree.XPath('.//*[@data-qa]')
+
+STRIP_TABLE = str.maketrans('', '', '\n\t')
+# handle thousand separators and decimal comma: 1.234,5 -> 1234.5
+DECIMAL_COMMA_TABLE = str.maketrans({'.': None, ',': '.'})
+
 LABEL_DICT = {
     'POSTING_CARD_PRICE' : 'price',
     'expensas' : 'expenses',
@@ -23,51 +74,88 @@ LABEL_DICT = {
     'POSTING_CARD_DESCRIPTION' : 'description',
 }
 
+SKIPPED_LABELS = frozenset({'POSTING_CARD_PUBLISHER'})
+
 class Scraper:
-    def __init__(self, browser, base_url):
+    def __init__(self, browser, base_url, min_interval=MIN_FETCH_INTERVAL):
         self.browser = browser
         self.base_url = base_url
+        self.min_interval = min_interval
+        self.last_fetch_time = None
 
-    def scrap_page(self, page_number):
+    def get_page_url(self, page_number):
         if page_number == 1:
-            page_url = f'{self.base_url}{HTML_EXTENSION}'
-        else:
-            page_url = f'{self.base_url}{PAGE_URL_SUFFIX}{page_number}{HTML_EXTENSION}'
-
+            return f'{self.base_url}{HTML_EXTENSION}'
+        return f'{self.base_url}{PAGE_URL_SUFFIX}{page_number}{HTML_EXTENSION}'
+
+    def wait_for_next_fetch(self):
+        # Keep at least min_interval seconds between page fetches, but only
+        # sleep for the part of it not already spent parsing.
+        if self.last_fetch_time is not None:
+            wait = self.min_interval - (time.monotonic() - self.last_fetch_time)
+            if wait > 0:
+                time.sleep(wait)
+        self.last_fetch_time = time.monotonic()
+
+    def fetch_page(self, page_number):
+        page_url = self.get_page_url(page_number)
         print(f'URL: {page_url}')
+        # Pages served from the local cache don't hit the site.
+        if not self.browser.is_cached(page_url):
+            self.wait_for_next_fetch()
+        return self.browser.get_content(page_url)
+
+    def parse_page(self, page):
+        # Search pages only need the estate post cards, so parse them straight
+        # with lxml instead of building a BeautifulSoup tree. is_html makes
+        # UnicodeDammit honour <meta charset> before guessing, like bs4 does.
+        tree = html.fromstring(UnicodeDammit(page, is_html=True).unicode_markup)
+        for estate_post in ESTATE_POSTS_XPATH(tree):
+            yield self.parse_estate(estate_post)
 
-        page = self.browser.get_text(page_url)
-
-        soup = BeautifulSoup(page, 'lxml')
-        estate_posts = soup.find_all('div', attrs = {'data-posting-type' : True})
-        estates = []
-        for estate_post in estate_posts:
-            estate = self.parse_estate(estate_post)
-            estates.append(estate)
-        return estates
+    def scrap_page(self, page_number):
+        return self.parse_page(self.fetch_page(page_number))
 
     def scrap_website(self):
+        # Yields estates as each page is parsed, so callers can stream them.
         page_number = 1
-        estates = []
         estates_scraped = 0
+        page_size = ESTATES_PER_PAGE
         estates_quantity = self.get_estates_quantity()
-        while estates_quantity > estates_scraped:
-            print(f'Page: {page_number}')
-            estates += self.scrap_page(page_number)
-            page_number += 1
-            estates_scraped = len(estates)
-            time.sleep(3)
-
-        return estates
-
+        # Pages are fetched on a background thread so the next page can be
+        # downloading (or waiting on the rate limit) while this one is parsed.
+        executor = ThreadPoolExecutor(max_workers=1)
+        try:
+            next_page = None
+            while estates_quantity > estates_scraped:
+                print(f'Page: {page_number}')
+                if next_page is None:
+                    next_page = executor.submit(self.fetch_page, page_number)
+                page = next_page.result()
+                next_page = None
+                if estates_scraped + page_size < estates_quantity:
+                    next_page = executor.submit(self.fetch_page, page_number + 1)
+
+                page_estates = 0
+                for estate in self.parse_page(page):
+                    page_estates += 1
+                    yield estate
+                page_size = page_estates or page_size
+                page_number += 1
+                estates_scraped += page_estates
+        finally:
+            # Don't block a caller that stopped early on an unneeded prefetch.
+            executor.shutdown(wait=False, cancel_futures=True)
 
     def get_estates_quantity(self):
         page_url = f'{self.base_url}{HTML_EXTENSION}'
-        page = self.browser.get_text(page_url)
+        page = self.browser.get_content(page_url)
         soup = BeautifulSoup(page, 'lxml')
-        soup.find_all('h1')[0].text
+        h1 = soup.find('h1')
+        if h1 is None:
+            raise ValueError(f'No <h1> with the estates quantity found in {page_url}')
 
-        estates_quantity = re.findall(r'\d+\.?\d+', soup.find_all('h1')[0].text)[0]
+        estates_quantity = NUMBER_PATTERN.findall(h1.get_text())[0]
 
         estates_quantity = estates_quantity.replace('.', '')
 
@@ -75,118 +163,58 @@ class Scraper:
         return estates_quantity
 
     def parse_estate(self, estate_post):
-        # Zonaprop moved many fields from <div> to <h2>/<h3>.
-        # Don't restrict to any tag type, just look for data-qa.
-        data_qa = estate_post.find_all(attrs={'data-qa': True})
-        url = estate_post.get_attribute_list('data-to-posting')[0]
+        # estate_post is an lxml element for a div[data-posting-type] card.
+        url = estate_post.get('data-to-posting')
         estate = {}
         estate['url'] = url
-        for data in data_qa:
-            label = data['data-qa']
-            text = None
-            if label.startswith('CARD_') or label in {'POSTING_CARD_PUBLISHER'}:
+        for data in DATA_QA_XPATH(estate_post):
+            label = data.get('data-qa')
+            if label in SKIPPED_LABELS or label.startswith('CARD_'):
                 continue
-            if label in ['POSTING_CARD_PRICE', 'expensas']:
-                currency_value, currency_type = self.parse_currency_value(data.get_text())
-                estate[LABEL_DICT[label] + '_' + 'value'] = currency_value
-                estate[LABEL_DICT[label] + '_' + 'type'] = currency_type
-            elif label in ['POSTING_CARD_LOCATION', 'POSTING_CARD_DESCRIPTION']:
-                text = self.parse_text(data.get_text())
-                estate[LABEL_DICT[label]] = text
-            elif label in ['POSTING_CARD_FEATURES']:
-                features = self.parse_features(data.get_text())
-                estate.update(features)
-            else:
-                text = data.get_text()
-                estate[label] = text
+            parse_label = LABEL_PARSERS.get(label, Scraper.parse_raw_label)
+            parse_label(self, label, data.text_content(), estate)
         return estate
 
+    def parse_currency_label(self, label, text, estate):
+        currency_value, currency_type = self.parse_currency_value(text)
+        estate[LABEL_DICT[label] + '_' + 'value'] = currency_value
+        estate[LABEL_DICT[label] + '_' + 'type'] = currency_type
+
+    def parse_text_label(self, label, text, estate):
+        estate[LABEL_DICT[label]] = self.parse_text(text)
+
+    def parse_features_label(self, label, text, estate):
+        estate.update(self.parse_features(text))
+
+    def parse_raw_label(self, label, text, estate):
+        estate[label] = text
+
     def parse_currency_value(self, text):
         try:
-            currency_value = re.findall(r'\d+\.?\d+', text)[0]
+            currency_value = NUMBER_PATTERN.findall(text)[0]
             currency_value = currency_value.replace('.', '')
             currency_value = int(currency_value)
-            currency_type = re.findall(r'(USD)|(ARS)|(\$)', text)[0]
+            currency_type = CURRENCY_PATTERN.findall(text)[0]
             currency_type = [x for x in currency_type if x != ''][0]
             return currency_value, currency_type
         except:
             return text, None
 
     def parse_text(self, text):
-        text = text.replace('\n', '')
-        text = text.replace('\t', '')
-        text = text.strip()
-        return text
+        return text.translate(STRIP_TABLE).strip()
 
     def parse_features(self, text):
-
-        def normalize_number(raw: str) -> str:
-            raw = raw.strip()
-            # handle thousand separators and decimal comma
-            raw = raw.replace('.', '').replace(',', '.')
-            return raw
-
-        def normalize_unit(raw: str) -> str:
-            raw = raw.strip().lower()
-            raw = raw.rstrip('.')
-            # normalize common variants
-            if raw in {'m²', 'm2'}:
-                return 'm²'
-            if raw in {'amb', 'ambs'}:
-                return 'amb'
-            if raw in {'dorm', 'dorms'}:
-                return 'dorm'
-            if raw in {'baño', 'baños'}:
-                return 'baños'
-            if raw in {'coch', 'cocheras'}:
-                return 'coch'
-            return raw
-
-        def area_kind(qualifier: str | None) -> str | None:
-            if not qualifier:
-                return None
-            q = qualifier.strip().lower().rstrip('.')
-            if q.startswith('tot'):
-                return 'square_meters_total'
-            if q.startswith('cub'):
-                return 'square_meters_covered'
-            if q.startswith('terr'):
-                return 'square_meters_land'
-            return None
-
-        # Examples seen in the wild:
-        # "771 m² tot. | 8 amb. | 4 dorm. | 3 baños | 1 coch."
-        # We parse number + unit + optional qualifier for m².
-        pattern = re.compile(
-            r'(\d+(?:[\.,]\d+)*)\s*'
-            r'(m²|m2|amb\.?|dorm\.?|baños?|baño|coch\.?)(?:\s*(tot\.?|totales|cub\.?|cubiertos|terr\.?|terreno))?',
-            flags=re.IGNORECASE,
-        )
-
-        features_appearance = {
-            'square_meters_area': 0,
-            'square_meters_total': 0,
-            'square_meters_covered': 0,
-            'square_meters_land': 0,
-            'rooms': 0,
-            'bedrooms': 0,
-            'bathrooms': 0,
-            'parking': 0,
-        }
+        features_appearance = dict.fromkeys(INDEXED_FEATURES, 0)
 
         features = {}
-        for raw_value, raw_unit, raw_qual in pattern.findall(text):
-            value = normalize_number(raw_value)
-            unit = normalize_unit(raw_unit)
+        for match in FEATURE_PATTERN.finditer(text):
+            value = match['number'].translate(DECIMAL_COMMA_TABLE)
+            unit = match['unit'].lower().rstrip('.')
+            base_key = FEATURE_UNIT_DICT.get(unit, unit)
 
-            if unit == 'm²':
-                base_key = area_kind(raw_qual) or 'square_meters_area'
-            else:
-                base_key = FEATURE_UNIT_DICT.get(unit)
-
-            if not base_key:
-                # Unknown unit; keep something usable.
-                base_key = unit
+            if base_key == 'square_meters_area' and match['qualifier']:
+                qualifier = match['qualifier'].lower().rstrip('.')
+                base_key = AREA_QUALIFIER_DICT.get(qualifier, base_key)
 
             idx = features_appearance.get(base_key)
             if idx is None:
@@ -196,3 +224,14 @@ class Scraper:
                 features_appearance[base_key] += 1
 
         return features
+
+
+# data-qa label -> Scraper method that parses it into the estate dict.
+# Labels not listed here are stored as raw text.
+LABEL_PARSERS = {
+    'POSTING_CARD_PRICE': Scraper.parse_currency_label,
+    'expensas': Scraper.parse_currency_label,
+    'POSTING_CARD_LOCATION': Scraper.parse_text_label,
+    'POSTING_CARD_DESCRIPTION': Scraper.parse_text_label,
+    'POSTING_CARD_FEATURES': Scraper.parse_features_label,
+}
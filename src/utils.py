@@ -2,10 +2,11 @@ import datetime
 import os
 import re
 
+HOST_PATTERN = re.compile(r'(^https?://)(.*/)')
+
 
 def remove_host_from_url(url):
-    host_regex = r'(^https?://)(.*/)'
-    return re.sub(host_regex, '', url)
+    return HOST_PATTERN.sub('', url)
 
 def get_filename_from_datetime(base_url, extension):
     base_url_without_host = remove_host_from_url(base_url)
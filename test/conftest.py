@@ -1,4 +1,3 @@
-import codecs
 from pathlib import Path
 
 import pandas as pd
@@ -10,9 +9,8 @@ TEST_DIR = Path(__file__).resolve().parent
 
 @pytest.fixture
 def html_page():
-    # 'utf-8' codec can't decode byte 0xed in position 19806: invalid continuation byte
-    with codecs.open(TEST_DIR / 'mock' / 'html_page.html', 'r', encoding='latin-1') as f:
-        return f.read()
+    # Raw bytes, as returned by Browser.get_content; the page is latin-1 encoded.
+    return (TEST_DIR / 'mock' / 'html_page.html').read_bytes()
 
 @pytest.fixture
 def df_estates():
@@ -1,5 +1,8 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
 import pytest
-from src.browser import Browser
+from src.browser import POOL_SIZE, Browser, ResponseCache
 
 
 @pytest.fixture
@@ -10,3 +13,39 @@ def browser():
 class TestBrowser():
     def test_browser(self, browser):
         assert browser.get_text('https://www.google.com') is not None
+
+    def test_browser_uses_one_session_per_thread(self, browser):
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            worker_scraper = pool.submit(lambda: browser.scraper).result()
+
+        assert browser.scraper is browser.scraper
+        assert browser.scraper is not worker_scraper
+
+    def test_browser_session_pools_connections(self, browser):
+        adapter = browser.scraper.adapters['https://']
+        assert adapter._pool_maxsize == POOL_SIZE
+        assert adapter.max_retries.total == 3
+
+    def test_browser_caches_content_on_disk(self, mocker, tmp_path):
+        browser = Browser(cache_dir=tmp_path)
+        get = mocker.patch.object(browser, 'get', return_value=mocker.MagicMock(ok=True, content=b'<html></html>'))
+
+        assert not browser.is_cached('https://www.zonaprop.com.ar/a.html')
+        assert browser.get_content('https://www.zonaprop.com.ar/a.html') == b'<html></html>'
+        assert Browser(cache_dir=tmp_path).is_cached('https://www.zonaprop.com.ar/a.html')
+        assert Browser(cache_dir=tmp_path).get_content('https://www.zonaprop.com.ar/a.html') == b'<html></html>'
+        assert get.call_count == 1
+
+    def test_response_cache_deletes_expired_entries(self, tmp_path):
+        cache = ResponseCache(tmp_path, expire_after=60)
+        cache.set('https://www.zonaprop.com.ar/a.html', b'<html></html>')
+        path = cache.path('https://www.zonaprop.com.ar/a.html')
+        os.utime(path, (0, 0))
+
+        assert cache.get('https://www.zonaprop.com.ar/a.html') is None
+        assert not path.exists()
+
+    def test_browser_cache_can_be_disabled(self, monkeypatch, tmp_path):
+        monkeypatch.setenv('ZP_CACHE_DISABLE', '1')
+        assert Browser(cache_dir=tmp_path).cache is None
+        assert not Browser(cache_dir=tmp_path).is_cached('https://www.zonaprop.com.ar/a.html')
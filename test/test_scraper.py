@@ -4,14 +4,43 @@ from src.scraper import Scraper
 
 class TestScraper():
 
-    def test_scraper(self, mocker: pytest_mock.MockFixture, html_page: str):
+    def test_scraper(self, mocker: pytest_mock.MockFixture, html_page: bytes):
         browser = mocker.patch('src.browser.Browser')
         scraper = Scraper(browser, 'fake_url.com')
         scraper.get_estates_quantity = mocker.MagicMock(return_value=20)
-        browser.get_text = mocker.MagicMock(return_value=html_page)
-        estates = scraper.scrap_website()
+        browser.get_content = mocker.MagicMock(return_value=html_page)
+        estates = list(scraper.scrap_website())
         assert len(estates) == 20
 
+    def test_scraper_fetches_pages_until_quantity(self, mocker: pytest_mock.MockFixture, html_page: bytes):
+        browser = mocker.MagicMock()
+        browser.get_content.return_value = html_page
+        scraper = Scraper(browser, 'fake_url.com', min_interval=0)
+        scraper.get_estates_quantity = mocker.MagicMock(return_value=50)
+        estates = list(scraper.scrap_website())
+        assert len(estates) == 60
+        assert [call.args[0] for call in browser.get_content.call_args_list] == [
+            'fake_url.com.html',
+            'fake_url.com-pagina-2.html',
+            'fake_url.com-pagina-3.html',
+        ]
+
+    def test_scraper_skips_rate_limit_for_cached_pages(self, mocker: pytest_mock.MockFixture, html_page: bytes):
+        sleep = mocker.patch('src.scraper.time.sleep')
+        browser = mocker.MagicMock()
+        browser.get_content.return_value = html_page
+        scraper = Scraper(browser, 'fake_url.com', min_interval=10)
+
+        browser.is_cached.return_value = True
+        scraper.fetch_page(1)
+        scraper.fetch_page(2)
+        sleep.assert_not_called()
+
+        browser.is_cached.return_value = False
+        scraper.fetch_page(3)
+        scraper.fetch_page(4)
+        sleep.assert_called_once()
+
 
 def test_parse_features_parses_square_meters_and_abbreviations():
     scraper = Scraper(browser=None, base_url='fake')
@@ -23,3 +52,29 @@ def test_parse_features_parses_square_meters_and_abbreviations():
     assert features['bedrooms_0'] == '4'
     assert features['bathrooms_0'] == '3'
     assert features['parking_0'] == '1'
+
+
+def test_parse_text_strips_newlines_and_tabs():
+    scraper = Scraper(browser=None, base_url='fake')
+    assert scraper.parse_text('\n\t  Palermo,\tCapital Federal \n') == 'Palermo,Capital Federal'
+
+
+def test_get_estates_quantity(mocker: pytest_mock.MockFixture, html_page: bytes):
+    browser = mocker.MagicMock()
+    browser.get_content.return_value = html_page
+    scraper = Scraper(browser, 'fake_url.com')
+    assert scraper.get_estates_quantity() == 15217
+
+
+def test_parse_page_honours_declared_charset():
+    scraper = Scraper(browser=None, base_url='fake')
+    page = (
+        '<html><head><meta charset="iso-8859-15"></head><body>'
+        '<div data-posting-type="PROPERTY" data-to-posting="/p.html">'
+        '<div data-qa="POSTING_CARD_LOCATION">100 € Núñez</div>'
+        '</div></body></html>'
+    ).encode('iso-8859-15')
+
+    estates = list(scraper.parse_page(page))
+
+    assert estates == [{'url': '/p.html', 'location': '100 € Núñez'}]
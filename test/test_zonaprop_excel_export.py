@@ -0,0 +1,160 @@
+import time
+
+import pandas as pd
+from bs4 import BeautifulSoup
+
+from zonaprop_scraper.zonaprop_excel_export import (
+    _build_export_frame,
+    _clean_number,
+    _fetch_listing_details,
+    _iter_cards,
+    _parse_detail_areas,
+)
+
+
+def test_parse_detail_areas_prefers_icon_features_over_labels_and_jsonld():
+    html = '''
+    <html><body>
+    <script type="application/ld+json">{"floorSize": {"value": "99"}, "lotSize": "1.000"}</script>
+    <ul>
+        <li class="icon-feature"><i class="icon-stotal"></i> 771 m² tot.</li>
+        <li class="icon-feature"><i class="icon-scubierta"></i> 267 m² cub.</li>
+    </ul>
+    <div>Superficie total: 500 m2</div>
+    </body></html>
+    '''
+    areas = _parse_detail_areas(BeautifulSoup(html, 'lxml'))
+
+    assert areas == {'m2_total': 771.0, 'm2_covered': 267.0, 'm2_land': 1000.0}
+
+
+def test_parse_detail_areas_falls_back_to_labels():
+    html = '<html><body><div>Superficie cubierta 120m²</div><section>Lote 300 m²</section></body></html>'
+    areas = _parse_detail_areas(BeautifulSoup(html, 'lxml'))
+
+    assert areas == {'m2_total': None, 'm2_covered': 120.0, 'm2_land': 300.0}
+
+
+def test_parse_detail_areas_falls_back_when_an_icon_reads_zero():
+    html = '''
+    <html><body>
+    <ul>
+        <li class="icon-feature"><i class="icon-stotal"></i> 100 m² tot.</li>
+        <li class="icon-feature"><i class="icon-scubierta"></i> 80 m² cub.</li>
+        <li class="icon-feature"><i class="icon-sterreno"></i> 0 m²</li>
+    </ul>
+    <div>Superficie del terreno: 300 m²</div>
+    </body></html>
+    '''
+    areas = _parse_detail_areas(BeautifulSoup(html, 'lxml'))
+
+    assert areas == {'m2_total': 100.0, 'm2_covered': 80.0, 'm2_land': 300.0}
+
+
+def test_clean_number():
+    assert _clean_number('771 m² tot.') == 771.0
+    assert _clean_number('1.234,56') == 1234.56
+    assert _clean_number(85.5) == 85.5
+    assert _clean_number('') is None
+    assert _clean_number(None) is None
+
+
+def test_build_export_frame_merges_cards_and_details_in_card_order():
+    cards = [
+        {'url': '/a', 'price_value': 1000, 'price_type': 'USD', 'rooms_0': '3', 'square_meters_total_0': '80'},
+        {'url': '/b', 'price_value': 'Consultar precio'},
+        {'price_value': 5},
+    ]
+    details = {
+        1: {'link': 'b', 'detail_error': 'HTTPError: 404'},
+        0: {'link': 'a', 'title': 'A', 'm2_total': None, 'm2_covered': 50.0, 'm2_land': None},
+    }
+    df = _build_export_frame(cards, details)
+
+    assert df['link'].tolist() == ['a', 'b']
+    assert df.loc[0, 'm2_total'] == 80.0
+    assert df.loc[0, 'precio_por_m2'] == 20.0
+    assert df.loc[0, 'rooms'] == 3.0
+    assert pd.isna(df.loc[1, 'precio_por_m2'])
+    assert df.loc[1, 'detail_error'] == 'HTTPError: 404'
+
+
+def test_parse_detail_areas_labels_need_an_adjacent_area():
+    html = '''
+    <html><body>
+    <ul><li>Superficie total: 219 m²</li><li>Lote</li><li>3 ambientes</li><li>45 m² de balcón</li></ul>
+    </body></html>
+    '''
+    areas = _parse_detail_areas(BeautifulSoup(html, 'lxml'))
+
+    assert areas == {'m2_total': 219.0, 'm2_covered': None, 'm2_land': None}
+
+
+class FakeBrowser():
+    # Earlier listings answer slower, so fetches complete out of order.
+    delays = {'a': 0.2, 'b': 0.1, 'c': 0.0}
+
+    def __init__(self, cached=()):
+        self.cached = set(cached)
+
+    def is_cached(self, url):
+        return url in self.cached
+
+    def get_content(self, url):
+        name = url.rsplit('/', 1)[-1]
+        if name == 'boom':
+            raise ConnectionError('boom')
+        time.sleep(self.delays[name])
+        return f'<html><body><h1>{name}</h1></body></html>'.encode()
+
+
+def test_fetch_listing_details_keys_details_by_card_index():
+    cards = [
+        {'link': '/a'},
+        {'location': 'no link'},
+        {'url': '/boom'},
+        {'link': '/b'},
+        {'link': '/c'},
+    ]
+    seen_cards, details = _fetch_listing_details(FakeBrowser(), cards, sleep_detail_s=0, max_workers=4)
+
+    assert seen_cards == cards
+    assert sorted(details) == [0, 2, 3, 4]
+    assert [details[i]['title'] for i in (0, 3, 4)] == ['a', 'b', 'c']
+    assert details[2] == {
+        'link': 'https://www.zonaprop.com.ar/boom',
+        'detail_error': 'ConnectionError: boom',
+    }
+
+
+def test_fetch_listing_details_consumes_a_limited_card_stream():
+    consumed = []
+
+    def stream():
+        for name in ('a', 'b', 'c'):
+            consumed.append(name)
+            yield {'url': f'/{name}?tracking=1'}
+
+    cards = _iter_cards(stream(), max_listings=2)
+    seen_cards, details = _fetch_listing_details(FakeBrowser(), cards, sleep_detail_s=0, max_workers=2)
+
+    assert consumed == ['a', 'b']
+    assert [card['link'] for card in seen_cards] == [
+        'https://www.zonaprop.com.ar/a',
+        'https://www.zonaprop.com.ar/b',
+    ]
+    assert [details[i]['title'] for i in sorted(details)] == ['a', 'b']
+
+
+def test_fetch_listing_details_skips_sleep_for_cached_pages():
+    cards = [{'link': '/a'}, {'link': '/b'}, {'link': '/c'}]
+    browser = FakeBrowser(cached={
+        'https://www.zonaprop.com.ar/a',
+        'https://www.zonaprop.com.ar/b',
+        'https://www.zonaprop.com.ar/c',
+    })
+    start = time.monotonic()
+    _, details = _fetch_listing_details(browser, cards, sleep_detail_s=5, max_workers=3)
+
+    assert time.monotonic() - start < 1
+    assert [details[i]['title'] for i in sorted(details)] == ['a', 'b', 'c']
@@ -2,13 +2,16 @@ import argparse
 import json
 import re
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
 from html import unescape
-from typing import Any
+from itertools import islice
+from typing import Any, Iterable, Iterator
 from urllib.parse import urljoin, urlsplit, urlunsplit
 
 import pandas as pd
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, Tag
 
 from src.browser import Browser
 from src.scraper import Scraper
@@ -16,23 +19,73 @@ from src import utils
 
 
 ZONAPROP_HOST = "https://www.zonaprop.com.ar"
-
-
-def _clean_number(raw: str | None) -> float | None:
-    if raw is None:
-        return None
-    s = str(raw).strip()
-    if not s:
+DEFAULT_DETAIL_WORKERS = 8
+
+NUMBER_PATTERN = re.compile(r"\d+(?:[\.,]\d+)*")
+NUMBER_TOKEN_PATTERN = f"({NUMBER_PATTERN.pattern})"
+# 1.234,56 -> 1234.56 ; 1.234 -> 1234
+DECIMAL_COMMA_TABLE = str.maketrans({".": None, ",": "."})
+
+CARD_COLUMNS = [
+    "location",
+    "price_value",
+    "price_type",
+    "expenses_value",
+    "expenses_type",
+    "square_meters_total_0",
+    "rooms_0",
+    "bedrooms_0",
+    "bathrooms_0",
+    "parking_0",
+    "description",
+]
+DETAIL_COLUMNS = ["link", "title", "m2_total", "m2_covered", "m2_land", "detail_error"]
+EXPORT_COLUMNS = [
+    "link",
+    "title",
+    "location",
+    "price_value",
+    "price_type",
+    "expenses_value",
+    "expenses_type",
+    "m2_total",
+    "m2_covered",
+    "m2_land",
+    "precio_por_m2",
+    "rooms",
+    "bedrooms",
+    "bathrooms",
+    "parking",
+    "description",
+    "detail_error",
+]
+
+AREA_KEYS = ("m2_total", "m2_covered", "m2_land")
+# e.g. "Superficie total: 219 m²", "Superficie del terreno 300m2", "Lote - 450 m²"
+AREA_LABEL_PATTERN = re.compile(
+    r"(superficie\s+total|superficie\s+cubierta|superficie(?:\s+del)?\s+terreno|terreno|lote)"
+    r"\s*[:\-]?\s*(\d+(?:[\.,]\d+)*)\s*m[²2]",
+    re.IGNORECASE,
+)
+AREA_ICON_CLASSES = (
+    ("icon-scubierta", "m2_covered"),
+    ("icon-stotal", "m2_total"),
+    ("icon-sterreno", "m2_land"),
+)
+
+
+def _clean_number(raw: str | int | float | None) -> float | None:
+    if raw is None or isinstance(raw, bool):
         return None
+    # JSON-LD often carries plain numbers: no text to clean up.
+    if isinstance(raw, (int, float)):
+        return float(raw)
     # keep only the first numeric token
-    m = re.search(r"\d+(?:[\.,]\d+)*", s)
+    m = NUMBER_PATTERN.search(str(raw))
     if not m:
         return None
-    s = m.group(0)
-    # 1.234,56 -> 1234.56 ; 1.234 -> 1234
-    s = s.replace(".", "").replace(",", ".")
     try:
-        return float(s)
+        return float(m.group(0).translate(DECIMAL_COMMA_TABLE))
     except ValueError:
         return None
 
@@ -51,27 +104,27 @@ def _normalize_url(url: str) -> str:
     return urlunsplit((parts.scheme, parts.netloc, parts.path, "", ""))
 
 
-def _extract_jsonld(soup: BeautifulSoup) -> list[Any]:
-    blocks: list[Any] = []
-    for s in soup.find_all("script", attrs={"type": "application/ld+json"}):
-        txt = s.get_text(strip=True)
-        if not txt:
-            continue
-        try:
-            blocks.append(json.loads(txt))
-        except Exception:
-            continue
-    return blocks
+def _extract_jsonld(script: Tag, blocks: list[Any]) -> None:
+    txt = script.get_text(strip=True)
+    if not txt:
+        return
+    try:
+        blocks.append(json.loads(txt))
+    except Exception:
+        return
 
 
 def _walk_json(obj: Any):
-    if isinstance(obj, dict):
-        yield obj
-        for v in obj.values():
-            yield from _walk_json(v)
-    elif isinstance(obj, list):
-        for v in obj:
-            yield from _walk_json(v)
+    # Iterative pre-order walk yielding every dict; children are pushed in
+    # reverse so dicts come out in document order.
+    stack = deque([obj])
+    while stack:
+        obj = stack.pop()
+        if isinstance(obj, dict):
+            yield obj
+            stack.extend(reversed(obj.values()))
+        elif isinstance(obj, list):
+            stack.extend(reversed(obj))
 
 
 def _parse_detail_areas_from_jsonld(blocks: list[Any]) -> dict[str, float | None]:
@@ -114,88 +167,95 @@ def _parse_detail_areas_from_jsonld(blocks: list[Any]) -> dict[str, float | None
                 if out["m2_land"] is None and ("terreno" in name or "lote" in name):
                     out["m2_land"] = _clean_number(val)
 
-    return out
-
+        if all(v is not None for v in out.values()):
+            break
 
-def _parse_detail_areas_from_html(soup: BeautifulSoup) -> dict[str, float | None]:
-    # Generic fallback: scan text blocks for known labels and pick the first number + m².
-    out: dict[str, float | None] = {
-        "m2_total": None,
-        "m2_covered": None,
-        "m2_land": None,
-    }
+    return out
 
-    label_map = {
-        "superficie total": "m2_total",
-        "superficie cubierta": "m2_covered",
-        "superficie del terreno": "m2_land",
-        "superficie terreno": "m2_land",
-        "terreno": "m2_land",
-        "lote": "m2_land",
-    }
 
-    # Build a list of candidate elements with compact text
-    candidates = soup.find_all(["li", "div", "section"], limit=2000)
-    for el in candidates:
-        txt = el.get_text(" ", strip=True)
-        if not txt:
-            continue
-        low = txt.lower()
+def _area_label_key(label: str) -> str:
+    label = label.lower()
+    if "total" in label:
+        return "m2_total"
+    if "cubierta" in label:
+        return "m2_covered"
+    return "m2_land"
 
-        for lbl, key in label_map.items():
-            if out[key] is not None:
-                continue
-            if lbl in low:
-                # capture patterns like "219 m²" or "219m2"
-                import re
 
-                m = re.search(r"(\d+(?:[\.,]\d+)*)\s*(m²|m2)", txt, flags=re.IGNORECASE)
-                if m:
-                    out[key] = _clean_number(m.group(1))
+def _parse_detail_areas_from_labels(soup: BeautifulSoup) -> dict[str, float | None]:
+    # Generic fallback: find known labels followed by a number + m² in the page text.
+    out: dict[str, float | None] = dict.fromkeys(AREA_KEYS)
 
-        if out["m2_total"] is not None and out["m2_covered"] is not None and out["m2_land"] is not None:
+    for m in AREA_LABEL_PATTERN.finditer(soup.get_text(" ", strip=True)):
+        key = _area_label_key(m.group(1))
+        if out[key] is None:
+            out[key] = _clean_number(m.group(2))
+        if all(v is not None for v in out.values()):
             break
 
     return out
 
 
-def _parse_detail_areas_from_icon_features(soup: BeautifulSoup) -> dict[str, float | None]:
+def _is_icon_feature(el: Tag) -> bool:
+    # Matches the CSS selector "li.icon-feature > i".
+    if el.name != "i":
+        return False
+    li = el.parent
+    return li is not None and li.name == "li" and "icon-feature" in (li.get("class") or ())
+
+
+def _parse_detail_areas_from_icon_feature(icon: Tag, out: dict[str, float | None]) -> None:
     # Zonaprop detail pages often show areas as icon-feature list items:
     # - <i class="icon-stotal"></i> 771 m² tot.
     # - <i class="icon-scubierta"></i> 267 m² cub.
     # - <i class="icon-sterreno"></i> ...
-    out: dict[str, float | None] = {
-        "m2_total": None,
-        "m2_covered": None,
-        "m2_land": None,
-    }
+    classes = icon.get("class") or ()
+    for cls, key in AREA_ICON_CLASSES:
+        if cls in classes:
+            break
+    else:
+        return
+    if out[key]:
+        return
 
-    for li in soup.select("li.icon-feature"):
-        icon = li.select_one("i")
-        if not icon:
-            continue
-        classes = set(icon.get("class") or [])
-        txt = li.get_text(" ", strip=True)
-        val = _clean_number(txt)
-        if val is None:
+    val = _clean_number(icon.parent.get_text(" ", strip=True))
+    if val is not None:
+        out[key] = val
+
+
+def _parse_detail_areas(soup: BeautifulSoup) -> dict[str, float | None]:
+    # Walk the tree once, collecting icon-feature items and JSON-LD scripts.
+    areas_icons: dict[str, float | None] = dict.fromkeys(AREA_KEYS)
+    blocks: list[Any] = []
+
+    for el in soup.descendants:
+        if not isinstance(el, Tag):
             continue
 
-        if "icon-scubierta" in classes:
-            out["m2_covered"] = out["m2_covered"] or val
-        elif "icon-stotal" in classes:
-            out["m2_total"] = out["m2_total"] or val
-        elif "icon-sterreno" in classes:
-            out["m2_land"] = out["m2_land"] or val
+        if el.name == "script":
+            if el.get("type") == "application/ld+json":
+                _extract_jsonld(el, blocks)
+            continue
 
-        if out["m2_total"] is not None and out["m2_covered"] is not None and out["m2_land"] is not None:
-            break
+        if _is_icon_feature(el):
+            _parse_detail_areas_from_icon_feature(el, areas_icons)
+            # Icon features win over every other source, nothing left to find.
+            # Falsy readings (e.g. 0 m²) still fall back, as in the merge below.
+            if all(areas_icons.values()):
+                return areas_icons
 
-    return out
+    # Prefer HTML icon-features (most reliable), then labeled HTML, then JSON-LD.
+    areas_labels = _parse_detail_areas_from_labels(soup)
+    areas_jsonld = _parse_detail_areas_from_jsonld(blocks)
+    return {
+        key: areas_icons[key] or areas_labels[key] or areas_jsonld[key]
+        for key in AREA_KEYS
+    }
 
 
-def parse_listing_detail(browser: Browser, url: str, sleep_s: float = 0.0) -> dict[str, Any]:
+def parse_listing_detail(browser: Browser, url: str) -> dict[str, Any]:
     url = _normalize_url(url)
-    html = browser.get_text(url)
+    html = browser.get_content(url)
     soup = BeautifulSoup(html, "lxml")
 
     title = None
@@ -203,19 +263,7 @@ def parse_listing_detail(browser: Browser, url: str, sleep_s: float = 0.0) -> di
     if h1:
         title = h1.get_text(" ", strip=True)
 
-    blocks = _extract_jsonld(soup)
-    # Prefer HTML icon-features (most reliable), then labeled HTML, then JSON-LD.
-    areas_jsonld = _parse_detail_areas_from_jsonld(blocks)
-    areas_icons = _parse_detail_areas_from_icon_features(soup)
-    areas_labels = _parse_detail_areas_from_html(soup)
-    areas = {
-        "m2_total": areas_icons.get("m2_total") or areas_labels.get("m2_total") or areas_jsonld.get("m2_total"),
-        "m2_covered": areas_icons.get("m2_covered") or areas_labels.get("m2_covered") or areas_jsonld.get("m2_covered"),
-        "m2_land": areas_icons.get("m2_land") or areas_labels.get("m2_land") or areas_jsonld.get("m2_land"),
-    }
-
-    if sleep_s:
-        time.sleep(sleep_s)
+    areas = _parse_detail_areas(soup)
 
     return {
         "link": url,
@@ -224,75 +272,113 @@ def parse_listing_detail(browser: Browser, url: str, sleep_s: float = 0.0) -> di
     }
 
 
+def _fetch_listing_detail(browser: Browser, link: str) -> dict[str, Any]:
+    try:
+        return parse_listing_detail(browser, link)
+    except Exception as e:
+        return {"link": _normalize_url(link), "detail_error": f"{type(e).__name__}: {e}"}
+
+
+def _iter_cards(cards: Iterable[dict[str, Any]], max_listings: int | None) -> Iterator[dict[str, Any]]:
+    # Normalize card urls and optionally limit
+    for card in islice(cards, max_listings):
+        if "url" in card:
+            card["link"] = _normalize_url(card["url"])
+        yield card
+
+
+def _fetch_listing_details(
+    browser: Browser,
+    cards: Iterable[dict[str, Any]],
+    sleep_detail_s: float,
+    max_workers: int,
+) -> tuple[list[dict[str, Any]], dict[int, dict[str, Any]]]:
+    # Detail pages are I/O bound, so fetch them concurrently. Requests still
+    # start at most once every sleep_detail_s, as in the old serial loop; the
+    # workers only overlap the time spent waiting on responses. Pages already
+    # in the local cache are not requested, so they skip the sleep.
+    # cards may be a stream: detail fetches start while search pages are
+    # still being scraped. The consumed cards are returned with the details.
+    seen_cards: list[dict[str, Any]] = []
+    details: dict[int, dict[str, Any]] = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {}
+        for i, card in enumerate(cards):
+            seen_cards.append(card)
+            link = card.get("link") or card.get("url")
+            if not link:
+                continue
+            futures[pool.submit(_fetch_listing_detail, browser, str(link))] = i
+            if sleep_detail_s and not browser.is_cached(_normalize_url(str(link))):
+                time.sleep(sleep_detail_s)
+
+        for done, future in enumerate(as_completed(futures), start=1):
+            i = futures[future]
+            details[i] = future.result()
+            print(f"[{done}/{len(futures)}] {details[i]['link']}")
+
+    return seen_cards, details
+
+
+def _to_number(values: pd.Series) -> pd.Series:
+    # Vectorized _clean_number for a column of card strings.
+    token = values.astype("string").str.extract(NUMBER_TOKEN_PATTERN, expand=False)
+    token = token.str.replace(".", "", regex=False).str.replace(",", ".", regex=False)
+    return pd.to_numeric(token, errors="coerce")
+
+
+def _build_export_frame(cards: list[dict[str, Any]], details: dict[int, dict[str, Any]]) -> pd.DataFrame:
+    # Cards without a fetched detail (no link) are dropped; card order is kept.
+    index = sorted(details)
+    card_df = pd.DataFrame(cards).reindex(index=index, columns=CARD_COLUMNS)
+    detail_df = pd.DataFrame.from_dict(details, orient="index").reindex(index=index, columns=DETAIL_COLUMNS)
+
+    # Best-effort: bring card features into friendly columns
+    m2_total = pd.to_numeric(detail_df["m2_total"], errors="coerce")
+    m2_total = m2_total.mask(m2_total.isna() | (m2_total == 0), _to_number(card_df["square_meters_total_0"]))
+    m2_covered = pd.to_numeric(detail_df["m2_covered"], errors="coerce")
+    denom = m2_covered.mask(m2_covered.isna() | (m2_covered == 0), m2_total)
+    price_value_num = pd.to_numeric(card_df["price_value"], errors="coerce")
+
+    df = pd.DataFrame({
+        "link": detail_df["link"],
+        "title": detail_df["title"],
+        "location": card_df["location"],
+        "price_value": card_df["price_value"],
+        "price_type": card_df["price_type"],
+        "expenses_value": card_df["expenses_value"],
+        "expenses_type": card_df["expenses_type"],
+        "m2_total": m2_total,
+        "m2_covered": m2_covered,
+        "m2_land": detail_df["m2_land"],
+        "precio_por_m2": price_value_num / denom.where(denom > 0),
+        "rooms": _to_number(card_df["rooms_0"]),
+        "bedrooms": _to_number(card_df["bedrooms_0"]),
+        "bathrooms": _to_number(card_df["bathrooms_0"]),
+        "parking": _to_number(card_df["parking_0"]),
+        "description": card_df["description"],
+        "detail_error": detail_df["detail_error"],
+    }, columns=EXPORT_COLUMNS)
+    return df.reset_index(drop=True)
+
+
 def export_search_to_excel(
     search_url: str,
     output: str | None,
     max_listings: int | None,
     sleep_detail_s: float,
+    max_workers: int = DEFAULT_DETAIL_WORKERS,
 ) -> str:
     base_url = utils.parse_zonaprop_url(search_url)
 
     browser = Browser()
     scraper = Scraper(browser, base_url)
-    cards = scraper.scrap_website()
-
-    # Normalize card urls and optionally limit
-    for c in cards:
-        if "url" in c:
-            c["link"] = _normalize_url(c["url"])
-
-    if max_listings is not None:
-        cards = cards[: max_listings]
-
-    rows: list[dict[str, Any]] = []
-    for i, card in enumerate(cards, start=1):
-        link = card.get("link") or card.get("url")
-        if not link:
-            continue
+    # Search results are streamed into the detail fetches, and scraping stops
+    # as soon as max_listings cards have been seen.
+    cards = _iter_cards(scraper.scrap_website(), max_listings)
+    cards, details = _fetch_listing_details(browser, cards, sleep_detail_s, max_workers)
 
-        try:
-            detail = parse_listing_detail(browser, str(link), sleep_s=sleep_detail_s)
-        except Exception as e:
-            detail = {"link": _normalize_url(str(link)), "detail_error": f"{type(e).__name__}: {e}"}
-
-        # Best-effort: bring card features into friendly columns
-        m2_total = detail.get("m2_total") or _clean_number(card.get("square_meters_total_0"))
-        m2_covered = detail.get("m2_covered")
-        price_value = card.get("price_value")
-        try:
-            price_value_num = float(price_value) if price_value is not None else None
-        except (TypeError, ValueError):
-            price_value_num = None
-
-        precio_por_m2 = None
-        denom = m2_covered or m2_total
-        if price_value_num is not None and denom is not None and denom > 0:
-            precio_por_m2 = price_value_num / denom
-
-        merged = {
-            "link": detail.get("link"),
-            "title": detail.get("title"),
-            "location": card.get("location"),
-            "price_value": price_value,
-            "price_type": card.get("price_type"),
-            "expenses_value": card.get("expenses_value"),
-            "expenses_type": card.get("expenses_type"),
-            "m2_total": m2_total,
-            "m2_covered": m2_covered,
-            "m2_land": detail.get("m2_land"),
-            "precio_por_m2": precio_por_m2,
-            "rooms": _clean_number(card.get("rooms_0")),
-            "bedrooms": _clean_number(card.get("bedrooms_0")),
-            "bathrooms": _clean_number(card.get("bathrooms_0")),
-            "parking": _clean_number(card.get("parking_0")),
-            "description": card.get("description"),
-            "detail_error": detail.get("detail_error"),
-        }
-
-        print(f"[{i}/{len(cards)}] {merged['link']}")
-        rows.append(merged)
-
-    df = pd.DataFrame(rows)
+    df = _build_export_frame(cards, details)
 
     if output is None:
         output = utils.get_filename_from_datetime(base_url, "xlsx")
@@ -308,6 +394,7 @@ def main():
     parser.add_argument("--output", "-o", default=None, help="Output .xlsx path (default: data/<...>.xlsx)")
     parser.add_argument("--max", type=int, default=None, help="Max listings to scrape (useful for quick tests)")
     parser.add_argument("--sleep-detail", type=float, default=1.0, help="Seconds to sleep between detail pages")
+    parser.add_argument("--workers", type=int, default=DEFAULT_DETAIL_WORKERS, help="Concurrent detail page fetches")
     args = parser.parse_args()
 
     out = export_search_to_excel(
@@ -315,6 +402,7 @@ def main():
         output=args.output,
         max_listings=args.max,
         sleep_detail_s=args.sleep_detail,
+        max_workers=args.workers,
     )
     print(f"Excel saved to {out}")
 
@@ -13,8 +13,7 @@ def main(url):
     print(f'This may take a while...')
     browser = Browser()
     scraper = Scraper(browser, base_url)
-    estates = scraper.scrap_website()
-    df = pd.DataFrame(estates)
+    df = pd.DataFrame.from_records(scraper.scrap_website())
     print('Scraping finished !!!')
     print('Saving data to csv file')
     filename = utils.get_filename_from_datetime(base_url, 'csv')